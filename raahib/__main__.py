@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import json
+import sys
 
 from raahib.router import Router
 from raahib.state import AppState
 
+# json.dumps(..., sort_keys=True) builds a new JSONEncoder per call; reuse one instead.
+_encode_metadata = json.JSONEncoder(sort_keys=True).encode
+
 
 def main() -> None:
     state = AppState()
@@ -14,22 +18,26 @@ def main() -> None:
     tags_on = "on" if getattr(router.dua_provider, "tags_configured", False) else "off"
     print("Raahib OS REPL. Type 'quit' to exit.")
     print(f"providers: hadith={hadith_on}, dua={dua_on}, tags={tags_on}")
-    while True:
-        try:
-            user_text = input("> ").strip()
-        except (EOFError, KeyboardInterrupt):
-            print("\nGoodbye.")
-            break
-
-        if user_text.lower() in {"quit", "exit"}:
-            print("Goodbye.")
-            break
-        if not user_text:
-            continue
-
-        result = router.route(user_text)
-        print(f"response: {result.text}")
-        print("metadata:", json.dumps(result.metadata, sort_keys=True))
+    try:
+        while True:
+            try:
+                user_text = input("> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print("\nGoodbye.")
+                break
+
+            if user_text.lower() in {"quit", "exit"}:
+                print("Goodbye.")
+                break
+            if not user_text:
+                continue
+
+            result = router.route(user_text)
+            # One write and one flush per turn instead of two print() calls.
+            sys.stdout.write(f"response: {result.text}\nmetadata: {_encode_metadata(result.metadata)}\n")
+            sys.stdout.flush()
+    finally:
+        router.close()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,27 @@
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass
+from itertools import islice
+from typing import Callable
+
 from raahib.kb import KnowledgeBase
-from raahib.modes import parse_mode
+from raahib.modes import Mode, parse_mode
 from raahib.providers import DuaProvider, HadithProvider
 from raahib.state import AppState
 
+_ALLOWED_MODES_STR = ", ".join(m.value for m in Mode)
+
+_KB_ADD_FIELDS = ("type", "title", "source_name", "reference", "auth_grade (optional)", "tags (optional)")
+
+
+def _command_meta(name: str, success: bool = True, **extra: str) -> dict[str, str]:
+    # A fresh dict per result: the REPL serialises it with json.dumps and callers may extend it.
+    meta = {"type": "command", "name": name, "success": "true" if success else "false"}
+    if extra:
+        meta.update(extra)
+    return meta
+
 
 @dataclass(slots=True)
 class CommandResult:
@@ -21,19 +37,33 @@ class CommandParser:
         hadith_provider: HadithProvider | None = None,
         dua_provider: DuaProvider | None = None,
     ) -> None:
-        self.kb = kb or KnowledgeBase()
+        self._kb = kb
         self.hadith_provider = hadith_provider
         self.dua_provider = dua_provider
 
+    @property
+    def kb(self) -> KnowledgeBase:
+        # Built on first kb:* command so a cold REPL start never touches the default database.
+        if self._kb is None:
+            self._kb = KnowledgeBase()
+        return self._kb
+
+    def _read_fields(self, labels: tuple[str, ...]) -> list[str]:
+        return [input(f"{label}: ").strip() for label in labels]
+
     def _read_multiline(self, prompt: str) -> str | None:
         print(prompt)
-        print("Finish with a single '.' on its own line.")
+        print("Finish with a single '.' on its own line.", flush=True)
         lines: list[str] = []
-        while True:
-            line = input().rstrip("\n")
+        # Read the buffered stream directly; input() adds readline/prompt handling per line.
+        for raw in iter(sys.stdin.readline, ""):
+            line = raw.rstrip("\n")
             if line.strip() == ".":
                 break
             lines.append(line)
+        else:
+            # Input ended before the "." line, as input() would report it: abort rather than add a partial card.
+            raise EOFError
         text = "\n".join(lines).strip()
         return text or None
 
@@ -42,205 +72,205 @@ class CommandParser:
         if not cleaned:
             return CommandResult(handled=False)
 
-        if cleaned.lower().startswith("mode:"):
-            mode_name = cleaned.split(":", 1)[1].strip()
-            mode = parse_mode(mode_name)
-            if mode is None:
-                return CommandResult(
-                    handled=True,
-                    output=f"Unknown mode '{mode_name}'. Allowed: {', '.join(m.value for m in state.mode.__class__)}",
-                    metadata={"type": "command", "name": "mode", "success": "false"},
-                )
-            state.mode = mode
-            return CommandResult(
-                handled=True,
-                output=f"Mode set to {mode.value}.",
-                metadata={"type": "command", "name": "mode", "success": "true"},
-            )
+        if cleaned[:5].lower() == "mode:":
+            return self._handle_mode(cleaned.partition(":")[2].strip(), state)
 
-        if cleaned.lower() == "status":
-            capabilities = ", ".join(
-                f"{k}={'on' if v else 'off'}" for k, v in sorted(state.capabilities.items())
-            )
-            hadith_on = "on" if self.hadith_provider and self.hadith_provider.configured else "off"
-            dua_on = "on" if self.dua_provider and self.dua_provider.configured else "off"
-            dua_tags_on = "on" if self.dua_provider and getattr(self.dua_provider, "tags_configured", False) else "off"
-            return CommandResult(
-                handled=True,
-                output=(
-                    f"mode={state.mode.value}; capabilities: {capabilities}; "
-                    f"providers: hadith={hadith_on}, dua={dua_on}, tags={dua_tags_on}"
-                ),
-                metadata={"type": "command", "name": "status", "success": "true"},
-            )
+        head, _, rest = cleaned.partition(" ")
+        head = head.lower()
+        rest = rest.strip()
+        handler = self._HANDLERS.get(head)
+        # Argument commands ("kb:search <query>") need a tail; bare commands ("status") must not have one.
+        if handler is None or bool(rest) is not (head in self._ARG_COMMANDS):
+            return CommandResult(handled=False)
+        return handler(self, rest, state)
 
-        if cleaned.lower() == "sources":
-            hadith_cfg = self.hadith_provider.configured if self.hadith_provider else False
-            dua_cfg = self.dua_provider.configured if self.dua_provider else False
-            dua_tags_cfg = bool(self.dua_provider and getattr(self.dua_provider, "tags_configured", False))
+    def _handle_mode(self, mode_name: str, state: AppState) -> CommandResult:
+        mode = parse_mode(mode_name)
+        if mode is None:
             return CommandResult(
                 handled=True,
-                output=(
-                    f"hadith={'on' if hadith_cfg else 'off'} path={state.settings.HADITH_DB_PATH or 'not set'}\n"
-                    f"dua={'on' if dua_cfg else 'off'} path={state.settings.DUAS_JSON_PATH or 'not set'}\n"
-                    f"dua_tags={'on' if dua_tags_cfg else 'off'} path={state.settings.DUA_TAGS_PATH or 'not set'}"
-                ),
-                metadata={"type": "command", "name": "sources", "success": "true"},
+                output=f"Unknown mode '{mode_name}'. Allowed: {_ALLOWED_MODES_STR}",
+                metadata=_command_meta("mode", success=False),
             )
+        state.mode = mode
+        return CommandResult(
+            handled=True,
+            output=f"Mode set to {mode.value}.",
+            metadata=_command_meta("mode"),
+        )
 
+    def _handle_status(self, _: str, state: AppState) -> CommandResult:
+        capabilities = state.capabilities_summary()
+        hadith_on = "on" if self.hadith_provider and self.hadith_provider.configured else "off"
+        dua_on = "on" if self.dua_provider and self.dua_provider.configured else "off"
+        dua_tags_on = "on" if self.dua_provider and getattr(self.dua_provider, "tags_configured", False) else "off"
+        return CommandResult(
+            handled=True,
+            output=(
+                f"mode={state.mode.value}; capabilities: {capabilities}; "
+                f"providers: hadith={hadith_on}, dua={dua_on}, tags={dua_tags_on}"
+            ),
+            metadata=_command_meta("status"),
+        )
 
-        if cleaned.lower() == "hadith:debug":
-            if not self.hadith_provider or not self.hadith_provider.configured:
-                return CommandResult(True, "Hadith provider is disabled.", {"type": "command", "name": "hadith_debug", "success": "false"})
-            stats = self.hadith_provider.debug_stats("patience")
-            output = (
-                f"hadiths_fts table: {'present' if stats['fts_present'] else 'missing'}\n"
-                f"hadith rows: {stats['hadith_rows']}\n"
-                f"fts sample match \"patience\": {stats['fts_sample_match']}"
-            )
-            return CommandResult(True, output, {"type": "command", "name": "hadith_debug", "success": "true"})
-
-        if cleaned.lower().startswith("hadith:search "):
-            query = cleaned.split(" ", 1)[1].strip()
-            if not self.hadith_provider or not self.hadith_provider.configured:
-                return CommandResult(True, "Hadith provider is disabled.", {"type": "command", "name": "hadith_search", "success": "false"})
-            hits = self.hadith_provider.search(query, limit=state.settings.PROVIDER_TOP_K)
-            if not hits:
-                return CommandResult(True, "No hadith hits found.", {"type": "command", "name": "hadith_search", "success": "true", "count": "0"})
-            lines = [
-                f"{h.id} | {h.book_name or 'Unknown'} | #{h.hadith_number or '?'} | {h.score:.2f}"
-                for h in hits
-            ]
-            return CommandResult(True, "\n".join(lines), {"type": "command", "name": "hadith_search", "success": "true", "count": str(len(hits))})
-
-        if cleaned.lower().startswith("dua:search "):
-            query = cleaned.split(" ", 1)[1].strip()
-            if not self.dua_provider or not self.dua_provider.configured:
-                return CommandResult(True, "Dua provider is disabled.", {"type": "command", "name": "dua_search", "success": "false"})
-            hits = self.dua_provider.search(query, limit=state.settings.PROVIDER_TOP_K)
-            if not hits:
-                return CommandResult(True, "No dua hits found.", {"type": "command", "name": "dua_search", "success": "true", "count": "0"})
-            lines = [f"{h.id} | {h.title} | {h.score:.2f}" for h in hits]
-            return CommandResult(True, "\n".join(lines), {"type": "command", "name": "dua_search", "success": "true", "count": str(len(hits))})
-
-        if cleaned.lower().startswith("kb:search "):
-            query = cleaned.split(" ", 1)[1].strip()
-            hits = self.kb.search(query)
-            if not hits:
-                return CommandResult(
-                    handled=True,
-                    output="No KB hits found.",
-                    metadata={"type": "command", "name": "kb_search", "success": "true", "count": "0"},
-                )
-            lines = [
-                f"{h.card.id} | {h.card.type} | {h.card.title} | {h.score:.2f}" for h in hits
-            ]
-            return CommandResult(
-                handled=True,
-                output="\n".join(lines),
-                metadata={
-                    "type": "command",
-                    "name": "kb_search",
-                    "success": "true",
-                    "count": str(len(hits)),
-                },
-            )
+    def _handle_sources(self, _: str, state: AppState) -> CommandResult:
+        hadith_cfg = self.hadith_provider.configured if self.hadith_provider else False
+        dua_cfg = self.dua_provider.configured if self.dua_provider else False
+        dua_tags_cfg = bool(self.dua_provider and getattr(self.dua_provider, "tags_configured", False))
+        return CommandResult(
+            handled=True,
+            output=(
+                f"hadith={'on' if hadith_cfg else 'off'} path={state.settings.HADITH_DB_PATH or 'not set'}\n"
+                f"dua={'on' if dua_cfg else 'off'} path={state.settings.DUAS_JSON_PATH or 'not set'}\n"
+                f"dua_tags={'on' if dua_tags_cfg else 'off'} path={state.settings.DUA_TAGS_PATH or 'not set'}"
+            ),
+            metadata=_command_meta("sources"),
+        )
 
-        if cleaned.lower().startswith("kb:show "):
-            try:
-                card_id = int(cleaned.split(" ", 1)[1].strip())
-            except ValueError:
-                return CommandResult(
-                    handled=True,
-                    output="Invalid KB id.",
-                    metadata={"type": "command", "name": "kb_show", "success": "false"},
-                )
-            card = self.kb.get_card(card_id)
-            if card is None:
-                return CommandResult(
-                    handled=True,
-                    output="Card not found.",
-                    metadata={"type": "command", "name": "kb_show", "success": "false"},
-                )
-            out = (
-                f"type: {card.type}\n"
-                f"title: {card.title}\n"
-                f"arabic: {card.arabic or ''}\n"
-                f"translation: {card.translation_en or ''}\n"
-                f"explanation: {card.explanation or ''}\n"
-                f"source_name: {card.source_name}\n"
-                f"reference: {card.reference}\n"
-                f"auth_grade: {card.auth_grade or ''}\n"
-                f"tags: {card.tags or ''}"
-            )
-            return CommandResult(
-                handled=True,
-                output=out,
-                metadata={"type": "command", "name": "kb_show", "success": "true", "card_id": str(card.id)},
-            )
+    def _handle_hadith_debug(self, _: str, state: AppState) -> CommandResult:
+        if not self.hadith_provider or not self.hadith_provider.configured:
+            return CommandResult(True, "Hadith provider is disabled.", _command_meta("hadith_debug", success=False))
+        stats = self.hadith_provider.debug_stats("patience")
+        output = (
+            f"hadiths_fts table: {'present' if stats['fts_present'] else 'missing'}\n"
+            f"hadith rows: {stats['hadith_rows']}\n"
+            f"fts sample match \"patience\": {stats['fts_sample_match']}"
+        )
+        return CommandResult(True, output, _command_meta("hadith_debug"))
 
-        if cleaned.lower().startswith("kb:delete "):
-            try:
-                card_id = int(cleaned.split(" ", 1)[1].strip())
-            except ValueError:
-                return CommandResult(
-                    handled=True,
-                    output="Invalid KB id.",
-                    metadata={"type": "command", "name": "kb_delete", "success": "false"},
-                )
-            deleted = self.kb.delete_card(card_id)
+    def _handle_hadith_search(self, query: str, state: AppState) -> CommandResult:
+        if not self.hadith_provider or not self.hadith_provider.configured:
+            return CommandResult(True, "Hadith provider is disabled.", _command_meta("hadith_search", success=False))
+        hits = self.hadith_provider.search(query, limit=state.settings.PROVIDER_TOP_K)
+        if not hits:
+            return CommandResult(True, "No hadith hits found.", _command_meta("hadith_search", count="0"))
+        output = "\n".join(
+            f"{h.id} | {h.book_name or 'Unknown'} | #{h.hadith_number or '?'} | {h.score:.2f}" for h in hits
+        )
+        return CommandResult(True, output, _command_meta("hadith_search", count=str(len(hits))))
+
+    def _handle_dua_search(self, query: str, state: AppState) -> CommandResult:
+        if not self.dua_provider or not self.dua_provider.configured:
+            return CommandResult(True, "Dua provider is disabled.", _command_meta("dua_search", success=False))
+        hits = self.dua_provider.search(query, limit=state.settings.PROVIDER_TOP_K)
+        if not hits:
+            return CommandResult(True, "No dua hits found.", _command_meta("dua_search", count="0"))
+        output = "\n".join(f"{h.id} | {h.title} | {h.score:.2f}" for h in hits)
+        return CommandResult(True, output, _command_meta("dua_search", count=str(len(hits))))
+
+    def _handle_kb_search(self, query: str, state: AppState) -> CommandResult:
+        hits = self.kb.search(query)
+        if not hits:
             return CommandResult(
                 handled=True,
-                output="Deleted." if deleted else "Card not found.",
-                metadata={
-                    "type": "command",
-                    "name": "kb_delete",
-                    "success": "true" if deleted else "false",
-                    "card_id": str(card_id),
-                },
+                output="No KB hits found.",
+                metadata=_command_meta("kb_search", count="0"),
             )
+        return CommandResult(
+            handled=True,
+            output="\n".join(f"{h.card.id} | {h.card.type} | {h.card.title} | {h.score:.2f}" for h in hits),
+            metadata=_command_meta("kb_search", count=str(len(hits))),
+        )
 
-        if cleaned.lower().startswith("kb:export "):
-            path = cleaned.split(" ", 1)[1].strip()
-            out_path = self.kb.export_json(path)
+    def _handle_kb_show(self, arg: str, state: AppState) -> CommandResult:
+        try:
+            card_id = int(arg)
+        except ValueError:
             return CommandResult(
                 handled=True,
-                output=f"Exported KB to {out_path}",
-                metadata={"type": "command", "name": "kb_export", "success": "true", "path": str(out_path)},
-            )
-
-        if cleaned.lower() == "kb:add":
-            ctype = input("type: ").strip()
-            title = input("title: ").strip()
-            source_name = input("source_name: ").strip()
-            reference = input("reference: ").strip()
-            auth_grade = input("auth_grade (optional): ").strip() or None
-            tags = input("tags (optional): ").strip() or None
-            arabic = self._read_multiline("arabic (optional multiline)")
-            translation = self._read_multiline("translation (optional multiline)")
-            explanation = self._read_multiline("explanation (optional multiline)")
-            card = self.kb.add_card(
-                type=ctype,
-                title=title,
-                source_name=source_name,
-                reference=reference,
-                auth_grade=auth_grade,
-                tags=tags,
-                arabic=arabic,
-                translation_en=translation,
-                explanation=explanation,
+                output="Invalid KB id.",
+                metadata=_command_meta("kb_show", success=False),
             )
+        card = self.kb.get_card(card_id)
+        if card is None:
             return CommandResult(
                 handled=True,
-                output=f"Added KB card #{card.id}: {card.title}",
-                metadata={"type": "command", "name": "kb_add", "success": "true", "card_id": str(card.id)},
+                output="Card not found.",
+                metadata=_command_meta("kb_show", success=False),
             )
+        out = (
+            f"type: {card.type}\n"
+            f"title: {card.title}\n"
+            f"arabic: {card.arabic or ''}\n"
+            f"translation: {card.translation_en or ''}\n"
+            f"explanation: {card.explanation or ''}\n"
+            f"source_name: {card.source_name}\n"
+            f"reference: {card.reference}\n"
+            f"auth_grade: {card.auth_grade or ''}\n"
+            f"tags: {card.tags or ''}"
+        )
+        return CommandResult(
+            handled=True,
+            output=out,
+            metadata=_command_meta("kb_show", card_id=str(card.id)),
+        )
 
-        if cleaned.lower() == "memory:show":
+    def _handle_kb_delete(self, arg: str, state: AppState) -> CommandResult:
+        try:
+            card_id = int(arg)
+        except ValueError:
             return CommandResult(
                 handled=True,
-                output="Memory view (stub): " + " | ".join(state.short_term_history[-5:]),
-                metadata={"type": "command", "name": "memory_show", "success": "true"},
+                output="Invalid KB id.",
+                metadata=_command_meta("kb_delete", success=False),
             )
+        deleted = self.kb.delete_card(card_id)
+        return CommandResult(
+            handled=True,
+            output="Deleted." if deleted else "Card not found.",
+            metadata=_command_meta("kb_delete", success=deleted, card_id=str(card_id)),
+        )
+
+    def _handle_kb_export(self, path: str, state: AppState) -> CommandResult:
+        out_path = self.kb.export_json(path)
+        return CommandResult(
+            handled=True,
+            output=f"Exported KB to {out_path}",
+            metadata=_command_meta("kb_export", path=str(out_path)),
+        )
+
+    def _handle_kb_add(self, _: str, state: AppState) -> CommandResult:
+        ctype, title, source_name, reference, auth_grade, tags = self._read_fields(_KB_ADD_FIELDS)
+        arabic = self._read_multiline("arabic (optional multiline)")
+        translation = self._read_multiline("translation (optional multiline)")
+        explanation = self._read_multiline("explanation (optional multiline)")
+        card = self.kb.add_card(
+            type=ctype,
+            title=title,
+            source_name=source_name,
+            reference=reference,
+            auth_grade=auth_grade or None,
+            tags=tags or None,
+            arabic=arabic,
+            translation_en=translation,
+            explanation=explanation,
+        )
+        return CommandResult(
+            handled=True,
+            output=f"Added KB card #{card.id}: {card.title}",
+            metadata=_command_meta("kb_add", card_id=str(card.id)),
+        )
+
+    def _handle_memory_show(self, _: str, state: AppState) -> CommandResult:
+        history = state.short_term_history
+        return CommandResult(
+            handled=True,
+            output="Memory view (stub): " + " | ".join(islice(history, max(0, len(history) - 5), None)),
+            metadata=_command_meta("memory_show"),
+        )
 
-        return CommandResult(handled=False)
+    # Keyed by the lowercased first word of the input; "mode:<name>" is matched by prefix in parse().
+    _HANDLERS: dict[str, Callable[[CommandParser, str, AppState], CommandResult]] = {
+        "status": _handle_status,
+        "sources": _handle_sources,
+        "hadith:debug": _handle_hadith_debug,
+        "hadith:search": _handle_hadith_search,
+        "dua:search": _handle_dua_search,
+        "kb:search": _handle_kb_search,
+        "kb:show": _handle_kb_show,
+        "kb:delete": _handle_kb_delete,
+        "kb:export": _handle_kb_export,
+        "kb:add": _handle_kb_add,
+        "memory:show": _handle_memory_show,
+    }
+    _ARG_COMMANDS = frozenset({"hadith:search", "dua:search", "kb:search", "kb:show", "kb:delete", "kb:export"})
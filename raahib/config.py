@@ -4,8 +4,15 @@ import os
 from dataclasses import dataclass, field
 from pathlib import Path
 
+_DEFAULT_CAPABILITIES: dict[str, bool] = {
+    "commands": True,
+    "safety": True,
+    "knowledge": True,
+    "cloud_llm": True,
+}
 
-@dataclass(slots=True)
+
+@dataclass(slots=True, frozen=True)
 class Settings:
     """Application settings for local Raahib OS behavior."""
 
@@ -25,21 +32,15 @@ class Settings:
         "health",
         "mood",
     )
-    capabilities: dict[str, bool] = field(
-        default_factory=lambda: {
-            "commands": True,
-            "safety": True,
-            "knowledge": True,
-            "cloud_llm": True,
-        }
-    )
+    capabilities: dict[str, bool] = field(default_factory=_DEFAULT_CAPABILITIES.copy)
 
     def __post_init__(self) -> None:
-        self.HADITH_DB_PATH = self.HADITH_DB_PATH or os.getenv("RAAHIB_HADITH_DB_PATH")
-        self.DUAS_JSON_PATH = self.DUAS_JSON_PATH or os.getenv("RAAHIB_DUAS_JSON_PATH")
-        self.DUA_TAGS_PATH = self.DUA_TAGS_PATH or os.getenv("RAAHIB_DUA_TAGS_PATH")
-        self.data_dir.mkdir(parents=True, exist_ok=True)
-        self.kb_db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Frozen: DEFAULT_SETTINGS is shared by every AppState, so env defaults are filled in here only.
+        object.__setattr__(self, "HADITH_DB_PATH", self.HADITH_DB_PATH or os.getenv("RAAHIB_HADITH_DB_PATH"))
+        object.__setattr__(self, "DUAS_JSON_PATH", self.DUAS_JSON_PATH or os.getenv("RAAHIB_DUAS_JSON_PATH"))
+        object.__setattr__(self, "DUA_TAGS_PATH", self.DUA_TAGS_PATH or os.getenv("RAAHIB_DUA_TAGS_PATH"))
+        for directory in (self.data_dir, self.kb_db_path.parent):
+            directory.mkdir(parents=True, exist_ok=True)
 
     @property
     def kb_strong_match_threshold(self) -> float:
@@ -1,10 +1,20 @@
 from __future__ import annotations
 
+import heapq
 import json
 import sqlite3
-from dataclasses import dataclass
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
 from datetime import datetime, timezone
+from operator import attrgetter
 from pathlib import Path
+from typing import NamedTuple
+
+from raahib.comfort import EMOTION_KEYWORDS
+from raahib.text import NormalizedText, fold_text
 
 
 @dataclass(slots=True)
@@ -20,58 +30,126 @@ class KnowledgeCard:
     auth_grade: str | None
     tags: str | None
     created_at: str
+    _rendered: str | None = field(default=None, init=False, repr=False, compare=False)
 
+    def render(self) -> str:
+        """Display text for the card, built once per card object (cached cards keep it across searches)."""
+        rendered = self._rendered
+        if rendered is None:
+            parts = [self.title]
+            if self.arabic:
+                parts.append(self.arabic)
+            if self.translation_en:
+                parts.append(self.translation_en)
+            if self.explanation:
+                parts.append(self.explanation)
+            parts.append(f"Source: {self.source_name} ({self.reference})")
+            if self.auth_grade:
+                parts.append(f"Auth grade: {self.auth_grade}")
+            rendered = self._rendered = "\n".join(parts)
+        return rendered
+
+
+class KnowledgeHit(NamedTuple):
+    """Immutable, so memoized search results can be handed out repeatedly without copying."""
 
-@dataclass(slots=True)
-class KnowledgeHit:
     card: KnowledgeCard
     score: float
 
 
+# (card, folded searchable fields, those fields joined, trigram bits absent from the blob). The last two let
+# search reject a term that cannot occur in the card before running any per-field substring test.
+_CardEntry = tuple[KnowledgeCard, tuple[str, ...], str, int]
+
+
 class KnowledgeBase:
     def __init__(self, db_path: str | Path = "./data/raahib_kb.sqlite") -> None:
         self.db_path = Path(db_path)
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        # Set once init_db has run on the open connection; close() clears it (":memory:" loses its schema).
+        self._schema_ready = False
+        # Both are rebuilt lazily after any write to cards (see _cards_changed).
+        self._card_cache: dict[int, _CardEntry] | None = None
+        self._ranked = lru_cache(maxsize=256)(self._rank)
+        self._term_state = lru_cache(maxsize=1024)(_new_term_state)
 
-    def init_db(self) -> None:
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """Yield the shared connection inside a transaction, opening it on first use."""
+        with self._lock:
+            conn = self._connection
+            if conn is None:
+                conn = self._connection = self._open()
             with conn:
-                conn.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS cards (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        type TEXT NOT NULL,
-                        title TEXT NOT NULL,
-                        arabic TEXT,
-                        translation_en TEXT,
-                        explanation TEXT,
-                        source_name TEXT NOT NULL,
-                        reference TEXT NOT NULL,
-                        auth_grade TEXT,
-                        tags TEXT,
-                        created_at TEXT NOT NULL
-                    )
-                    """
+                yield conn
+
+    def _open(self) -> sqlite3.Connection:
+        # ":memory:" lives only as long as the connection, so close() discards an in-memory KB.
+        if str(self.db_path) != ":memory:":
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in _STARTUP_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            conn, self._connection = self._connection, None
+            self._schema_ready = False
+            # The next connection may see other cards (":memory:" starts empty, another process may have written).
+            self._cards_changed()
+            if conn is None:
+                return
+            try:
+                conn.execute("PRAGMA optimize")
+            finally:
+                conn.close()
+
+    def init_db(self) -> None:
+        if self._schema_ready:
+            return
+        with self._conn() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cards (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    type TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    arabic TEXT,
+                    translation_en TEXT,
+                    explanation TEXT,
+                    source_name TEXT NOT NULL,
+                    reference TEXT NOT NULL,
+                    auth_grade TEXT,
+                    tags TEXT,
+                    created_at TEXT NOT NULL
                 )
-        finally:
-            conn.close()
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_type ON cards(type)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_tags ON cards(tags)")
+            # Search scans the in-memory card snapshot (see _rank), so no FTS index is kept in sync.
+            for statement in _DROP_LEGACY_FTS_SQL:
+                conn.execute(statement)
+        self._schema_ready = True
 
     def seed_if_empty(self) -> None:
         self.init_db()
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            with conn:
-                row = conn.execute("SELECT COUNT(*) AS c FROM cards").fetchone()
-                if row and row["c"] > 0:
-                    return
-        finally:
-            conn.close()
-
-        for item in _SEED_CARDS:
-            self.add_card(**item)
+        # BEGIN IMMEDIATE takes the write lock before the count, so two processes cannot both see an
+        # empty table and both seed it; the bulk insert then commits with it in a single transaction.
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT COUNT(*) AS c FROM cards").fetchone()
+            if row and row["c"] > 0:
+                return
+            created_at = datetime.now(timezone.utc).isoformat()
+            rows = [(*row, created_at) for row in _SEED_ROWS]
+            conn.executemany(_INSERT_CARD_SQL, rows)
+            # Gather planner statistics for the freshly filled table and its indexes.
+            conn.execute("PRAGMA optimize")
+            self._cards_changed()
 
     def add_card(
         self,
@@ -85,138 +163,211 @@ class KnowledgeBase:
         auth_grade: str | None = None,
         tags: str | None = None,
     ) -> KnowledgeCard:
-        created_at = datetime.now(timezone.utc).isoformat()
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            with conn:
-                cursor = conn.execute(
-                    """
-                    INSERT INTO cards(type, title, arabic, translation_en, explanation, source_name, reference, auth_grade, tags, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        type,
-                        title,
-                        arabic,
-                        translation_en,
-                        explanation,
-                        source_name,
-                        reference,
-                        auth_grade,
-                        tags,
-                        created_at,
-                    ),
-                )
-                card_id = int(cursor.lastrowid)
-        finally:
-            conn.close()
-        card = self.get_card(card_id)
-        if card is None:
-            raise RuntimeError("Inserted card could not be retrieved.")
-        return card
+        row = (
+            type,
+            title,
+            arabic,
+            translation_en,
+            explanation,
+            source_name,
+            reference,
+            auth_grade,
+            tags,
+            datetime.now(timezone.utc).isoformat(),
+        )
+        with self._conn() as conn:
+            cursor = conn.execute(_INSERT_CARD_SQL, row)
+            self._cards_changed()
+        # The INSERT columns follow KnowledgeCard's field order, so the card needs no read-back.
+        return KnowledgeCard(int(cursor.lastrowid), *row)
 
     def get_card(self, card_id: int) -> KnowledgeCard | None:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            with conn:
-                row = conn.execute("SELECT * FROM cards WHERE id = ?", (card_id,)).fetchone()
-        finally:
-            conn.close()
-        return _row_to_card(row) if row else None
+        with self._conn() as conn:
+            row = conn.execute(f"SELECT {_CARD_COLUMNS} FROM cards WHERE id = ?", (card_id,)).fetchone()
+        return KnowledgeCard(*row) if row else None
 
     def delete_card(self, card_id: int) -> bool:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            with conn:
-                cursor = conn.execute("DELETE FROM cards WHERE id = ?", (card_id,))
-        finally:
-            conn.close()
+        with self._conn() as conn:
+            cursor = conn.execute("DELETE FROM cards WHERE id = ?", (card_id,))
+            if cursor.rowcount:
+                self._cards_changed()
         return cursor.rowcount > 0
 
-    def search(self, query: str, limit: int = 5) -> list[KnowledgeHit]:
-        terms = [t.lower() for t in query.split() if t.strip()]
+    def search(self, query: str | NormalizedText, limit: int = 5) -> list[KnowledgeHit]:
+        # Repeated queries are answered from the memo until the next write. Holding the lock across the lookup
+        # keeps a concurrent write from clearing the memo while a result from the old cards is being stored.
+        with self._lock:
+            return list(self._ranked(NormalizedText.of(query).tokens, limit))
+
+    def _cards_changed(self) -> None:
+        self._card_cache = None
+        self._ranked.cache_clear()
+        self._term_state.cache_clear()
+
+    def _rank(self, tokens: tuple[str, ...], limit: int) -> tuple[KnowledgeHit, ...]:
+        # Scoring compares folded terms with folded fields.
+        terms = tuple(term for term in map(fold_text, tokens) if term)
         if not terms:
-            return []
+            return ()
 
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            with conn:
-                rows = conn.execute("SELECT * FROM cards").fetchall()
-        finally:
-            conn.close()
-
-        weights = {
-            "title": 4,
-            "tags": 3,
-            "arabic": 2,
-            "translation_en": 2,
-            "explanation": 1,
-            "source_name": 1,
-            "reference": 1,
-        }
-        max_per_term = sum(weights.values())
+        # fold_text collapses whitespace, so the rejoined tokens fold exactly like the original text.
+        full_query = fold_text(" ".join(tokens))
+        # Words from the same emotion family ("anxious" -> "anxiety", "worry", ...) form a discounted second tier.
+        related = tuple(dict.fromkeys(r for term in terms for r in _RELATED_TERMS.get(term, ()) if r not in terms))
+        with self._conn() as conn:
+            cards = self._cards(conn)
+
+        inv_max_score = 1.0 / (_MAX_PER_TERM * len(terms))
+
+        term_states = [(term, *self._term_state(term)) for term in terms]
+        related_states = [(term, *self._term_state(term)) for term in related]
+
+        def weighted_hits(states: list[tuple[str, int, dict[int, int]]], card_id: int, entry: _CardEntry) -> int:
+            score = 0
+            for term, grams, masks in states:
+                # Which fields contain the term, as a bitmask, computed once per (term, card) and then reused
+                # by every later query sharing the term until the next write.
+                mask = masks.get(card_id)
+                if mask is None:
+                    mask = masks[card_id] = _field_mask(term, grams, entry)
+                score += _MASK_WEIGHTS[mask]
+            return score
 
         hits: list[KnowledgeHit] = []
-        for row in rows:
-            card = _row_to_card(row)
-            score = 0.0
-            for term in terms:
-                if term in (card.title or "").lower():
-                    score += weights["title"]
-                if term in (card.tags or "").lower():
-                    score += weights["tags"]
-                if term in (card.arabic or "").lower():
-                    score += weights["arabic"]
-                if term in (card.translation_en or "").lower():
-                    score += weights["translation_en"]
-                if term in (card.explanation or "").lower():
-                    score += weights["explanation"]
-                if term in (card.source_name or "").lower():
-                    score += weights["source_name"]
-                if term in (card.reference or "").lower():
-                    score += weights["reference"]
-            normalized = min(1.0, score / (max_per_term * len(terms)))
-            full_query = query.lower().strip()
-            if full_query and full_query in (card.title or "").lower():
-                normalized = max(normalized, 0.9)
+        # Cards are scanned in id order, so equal scores keep their storage order; the trigram prefilter in
+        # _field_mask makes a card without the term cheap to reject.
+        for card_id, entry in cards.items():
+            card, fields = entry[0], entry[1]
+            normalized = min(1.0, weighted_hits(term_states, card_id, entry) * inv_max_score)
+            # The full-query title boost only lifts scores to 0.9, so skip the substring test above that.
+            if normalized < 0.9 and full_query in fields[0]:
+                normalized = 0.9
+            if related_states and normalized < _RELATED_SCORE_CAP:
+                related_score = weighted_hits(related_states, card_id, entry) * inv_max_score * _RELATED_DISCOUNT
+                normalized = max(normalized, min(_RELATED_SCORE_CAP, related_score))
             if normalized > 0:
-                hits.append(KnowledgeHit(card=card, score=normalized))
+                hits.append(KnowledgeHit(card, normalized))
 
-        hits.sort(key=lambda h: h.score, reverse=True)
-        return hits[:limit]
+        # Same result as a stable descending sort truncated to limit, without sorting every hit.
+        return tuple(heapq.nlargest(limit, hits, key=attrgetter("score")))
+
+    def _cards(self, conn: sqlite3.Connection) -> dict[int, _CardEntry]:
+        """Every card with its searchable fields folded once (see fold_text), in _FIELD_ORDER."""
+        cache = self._card_cache
+        if cache is None:
+            cache = {}
+            for row in conn.execute(f"SELECT {_CARD_COLUMNS} FROM cards ORDER BY id"):
+                card = KnowledgeCard(*row)
+                fields = tuple(fold_text(getattr(card, name) or "") for name in _FIELD_ORDER)
+                blob = "\0".join(fields)
+                cache[card.id] = (card, fields, blob, _ALL_GRAM_BITS ^ _trigram_bits(blob))
+            self._card_cache = cache
+        return cache
 
     def export_json(self, path: str | Path) -> Path:
         out_path = Path(path)
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            with conn:
-                rows = conn.execute("SELECT * FROM cards ORDER BY id").fetchall()
-        finally:
-            conn.close()
-        payload = [dict(r) for r in rows]
-        out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        encode = json.JSONEncoder(ensure_ascii=False, indent=2).encode
+        # Writes the same text as json.dumps(all_rows, ensure_ascii=False, indent=2), one card at a time,
+        # so neither the full row list nor the full JSON string is held in memory. Encoded strings escape
+        # newlines, so every "\n" in a card's JSON is structural and can take the extra list indent.
+        with self._conn() as conn, out_path.open("w", encoding="utf-8") as out:
+            empty = True
+            for row in conn.execute("SELECT * FROM cards ORDER BY id"):
+                out.write("[\n  " if empty else ",\n  ")
+                out.write(encode(dict(row)).replace("\n", "\n  "))
+                empty = False
+            out.write("[]" if empty else "\n]")
         return out_path
 
 
-def _row_to_card(row: sqlite3.Row) -> KnowledgeCard:
-    return KnowledgeCard(
-        id=int(row["id"]),
-        type=str(row["type"]),
-        title=str(row["title"]),
-        arabic=row["arabic"],
-        translation_en=row["translation_en"],
-        explanation=row["explanation"],
-        source_name=str(row["source_name"]),
-        reference=str(row["reference"]),
-        auth_grade=row["auth_grade"],
-        tags=row["tags"],
-        created_at=str(row["created_at"]),
-    )
+# Searchable fields and their per-term score weights.
+_FIELD_ORDER = ("title", "tags", "arabic", "translation_en", "explanation", "source_name", "reference")
+_FIELD_WEIGHTS = (4, 3, 2, 2, 1, 1, 1)
+_MAX_PER_TERM = sum(_FIELD_WEIGHTS)
+# Score contributed by each field mask (see _field_mask): _MASK_WEIGHTS[mask] sums the weights of its set bits.
+_MASK_WEIGHTS = tuple(
+    sum(weight for bit, weight in enumerate(_FIELD_WEIGHTS) if mask >> bit & 1)
+    for mask in range(1 << len(_FIELD_WEIGHTS))
+)
+
+# Related-word tier: hits count at half weight and never reach a strong match (0.72 by default), so they only
+# fill in results when the literal words miss.
+_RELATED_DISCOUNT = 0.5
+_RELATED_SCORE_CAP = 0.5
+
+
+def _build_related_terms() -> dict[str, tuple[str, ...]]:
+    """Map each single emotion word (and category name) to the other words of its comfort.EMOTION_KEYWORDS family."""
+    families: dict[str, dict[str, None]] = {}
+    for category, keywords in EMOTION_KEYWORDS.items():
+        # Short or multi-word entries ("low", "calm now") match too much as substrings to expand on.
+        words = [word for word in dict.fromkeys((category, *keywords)) if " " not in word and len(word) >= 4]
+        for word in words:
+            family = families.setdefault(word, {})
+            family.update(dict.fromkeys(other for other in words if other != word))
+    return {word: tuple(family) for word, family in families.items()}
+
+
+_RELATED_TERMS = _build_related_terms()
+
+# Trigram prefilter width. str hashes are salted per process, which is fine: the bits never leave memory.
+_GRAM_BITS = 1024
+_GRAM_MASK = _GRAM_BITS - 1
+_ALL_GRAM_BITS = (1 << _GRAM_BITS) - 1
+
+# KnowledgeCard's init fields in declaration order, so a selected row unpacks straight into the constructor.
+_CARD_COLUMNS = "id, type, title, arabic, translation_en, explanation, source_name, reference, auth_grade, tags, created_at"
+
+# Every column but id, in the same order; seed_if_empty and add_card share it.
+_INSERT_CARD_SQL = """
+    INSERT INTO cards(type, title, arabic, translation_en, explanation, source_name, reference, auth_grade, tags, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Applied once per connection. optimize=0x10002 is the form SQLite recommends right after opening a
+# long-lived connection: it refreshes stale planner statistics without a full ANALYZE.
+_STARTUP_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA optimize=0x10002",
+)
+
+# The cards_fts index and its sync triggers that databases written by earlier versions still carry.
+_DROP_LEGACY_FTS_SQL = (
+    "DROP TRIGGER IF EXISTS cards_ai",
+    "DROP TRIGGER IF EXISTS cards_ad",
+    "DROP TRIGGER IF EXISTS cards_au",
+    "DROP TABLE IF EXISTS cards_fts",
+)
+
+
+def _new_term_state(term: str) -> tuple[int, dict[int, int]]:
+    """Trigram bits of a query term plus an empty card id -> field mask memo for it."""
+    return _trigram_bits(term), {}
+
+
+def _field_mask(term: str, grams: int, entry: _CardEntry) -> int:
+    """Bit i is set when the term occurs in the card's field _FIELD_ORDER[i]."""
+    _, fields, blob, missing_grams = entry
+    # A substring's trigrams all occur in the text, so one the card lacks rules the term out.
+    if grams & missing_grams or term not in blob:
+        return 0
+    mask = 0
+    for bit, field in enumerate(fields):
+        if term in field:
+            mask |= 1 << bit
+    return mask
+
+
+def _trigram_bits(text: str) -> int:
+    """Bitset of the text's character trigrams, hashed into _GRAM_BITS buckets (empty below three characters)."""
+    bits = 0
+    for i in range(len(text) - 2):
+        bits |= 1 << (hash(text[i : i + 3]) & _GRAM_MASK)
+    return bits
 
 
 _SEED_CARDS = [
@@ -483,3 +634,19 @@ _SEED_CARDS = [
         "tags": "dua,tawakkul,trust",
     },
 ]
+
+# _SEED_CARDS in INSERT column order (everything but created_at), built once at import.
+_SEED_ROWS = tuple(
+    (
+        item["type"],
+        item["title"],
+        item.get("arabic"),
+        item.get("translation_en"),
+        item.get("explanation"),
+        item["source_name"],
+        item["reference"],
+        item.get("auth_grade"),
+        item.get("tags"),
+    )
+    for item in _SEED_CARDS
+)
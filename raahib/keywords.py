@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Mapping
+
+CRISIS_KEYWORDS = {
+    "suicide",
+    "kill myself",
+    "end my life",
+    "self-harm",
+    "hurt myself",
+}
+
+DISALLOWED_REQUEST_KEYWORDS = {
+    "build a bomb",
+    "make explosives",
+    "bypass law enforcement",
+}
+
+HEALTH_DIAGNOSIS_TERMS = {"diagnose", "diagnosis", "what disease", "medical certainty"}
+
+ISLAMIC_KEYWORDS = {
+    "quran",
+    "qur'an",
+    "hadith",
+    "dua",
+    "du'a",
+    "imam",
+    "fiqh",
+    "fatwa",
+    "marja",
+    "najaf",
+    "karbala",
+    "allah",
+    "sabr",
+    "ayah",
+    "tafsir",
+    "sunnah",
+    "حديث",
+    "دعاء",
+}
+
+CRISIS = "crisis"
+DISALLOWED = "disallowed"
+HEALTH = "health"
+ISLAMIC = "islamic"
+
+
+class KeywordMatcher:
+    """Reports which keyword buckets occur in a text, with `keyword in text` semantics, in one regex sweep."""
+
+    __slots__ = ("_search", "_implied")
+
+    def __init__(self, buckets: Mapping[str, Iterable[str]]) -> None:
+        owners: dict[str, set[str]] = {}
+        for bucket, keywords in buckets.items():
+            for keyword in keywords:
+                owners.setdefault(keyword, set()).add(bucket)
+        # The alternation tries longer keywords first and reports one match per position, so each keyword
+        # also carries the buckets of every shorter keyword that is a prefix of it.
+        self._implied = {
+            keyword: frozenset().union(*(owners[other] for other in owners if keyword.startswith(other)))
+            for keyword in owners
+        }
+        alternation = "|".join(re.escape(k) for k in sorted(owners, key=len, reverse=True))
+        self._search = re.compile(alternation).search
+
+    def buckets_in(self, lowered: str, stop_at: str | None = None) -> set[str]:
+        """Buckets with a keyword in `lowered`; returns as soon as `stop_at` is found."""
+        found: set[str] = set()
+        search = self._search
+        pos = 0
+        # Resume one character after each match start rather than at its end, so keywords that overlap
+        # a match are still seen.
+        while (match := search(lowered, pos)) is not None:
+            found |= self._implied[match.group()]
+            if stop_at in found:
+                break
+            pos = match.start() + 1
+        return found
+
+
+KEYWORD_MATCHER = KeywordMatcher(
+    {
+        DISALLOWED: DISALLOWED_REQUEST_KEYWORDS,
+        CRISIS: CRISIS_KEYWORDS,
+        HEALTH: HEALTH_DIAGNOSIS_TERMS,
+        ISLAMIC: ISLAMIC_KEYWORDS,
+    }
+)
@@ -1,21 +1,121 @@
 from __future__ import annotations
 
+import base64
+import http.client
 import json
 import os
-import urllib.error
+import select
+import threading
+import urllib.parse
 import urllib.request
 
+_API_HOST = "api.openai.com"
+_RESPONSES_PATH = "/v1/responses"
+_TIMEOUT_SECONDS = 20
+
+
+def _connect() -> http.client.HTTPSConnection:
+    """A connection to the API host, tunnelled through the HTTPS proxy urllib would use, if any."""
+    proxy = urllib.request.getproxies().get("https")
+    if not proxy or urllib.request.proxy_bypass(_API_HOST):
+        return http.client.HTTPSConnection(_API_HOST, timeout=_TIMEOUT_SECONDS)
+    parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    tunnel_headers = {}
+    if parts.username:
+        credentials = f"{urllib.parse.unquote(parts.username)}:{urllib.parse.unquote(parts.password or '')}"
+        tunnel_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+    # The CONNECT goes to the proxy in its own scheme, so a proxy URL without a port uses that scheme's default.
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    conn = http.client.HTTPSConnection(parts.hostname, port, timeout=_TIMEOUT_SECONDS)
+    conn.set_tunnel(_API_HOST, headers=tunnel_headers)
+    return conn
+
+
+def _connection_dropped(conn: http.client.HTTPSConnection) -> bool:
+    """True when an idle kept-alive connection was closed by the peer (the check urllib3 makes before reuse).
+
+    An idle socket has nothing to read, so one that polls readable holds the peer's FIN or stray data and cannot
+    carry another request.
+    """
+    sock = conn.sock
+    if sock is None:
+        # Not connected yet; http.client connects on the next request.
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
 
 class CloudLLM:
     """Cloud LLM wrapper with offline fallback behavior."""
 
     def __init__(self, model: str = "gpt-4.1-mini") -> None:
         self.model = model
+        self._conn: http.client.HTTPSConnection | None = None
+        # Body is '{"model": <model>, "input": <json string>}'; everything but the input is fixed per instance.
+        self._body_prefix = ('{"model": ' + json.dumps(model) + ', "input": ').encode("utf-8")
+        self._headers_key: str | None = None
+        self._headers: dict[str, str] = {}
+        self._lock = threading.Lock()
 
     @property
     def available(self) -> bool:
         return bool(os.getenv("OPENAI_API_KEY"))
 
+    def close(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _reset(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _post(self, body: bytes, headers: dict[str, str]) -> bytes:
+        # One keep-alive connection per instance, so only the first prompt pays for TCP + TLS setup.
+        with self._lock:
+            conn = self._conn
+            if conn is not None and _connection_dropped(conn):
+                # Closed while idle: reconnect before sending, so nothing is delivered twice.
+                self._reset()
+                conn = None
+            if conn is not None:
+                try:
+                    conn.request("POST", _RESPONSES_PATH, body=body, headers=headers)
+                except (OSError, http.client.HTTPException):
+                    # The server closed the idle connection, so the request never reached it and one fresh
+                    # attempt is safe.
+                    self._reset()
+                    conn = None
+            if conn is None:
+                conn = self._conn = _connect()
+                try:
+                    conn.request("POST", _RESPONSES_PATH, body=body, headers=headers)
+                except (OSError, http.client.HTTPException):
+                    self._reset()
+                    raise
+            try:
+                resp = conn.getresponse()
+                data = resp.read()
+            except (OSError, http.client.HTTPException):
+                # The request may already have been delivered; sending it again could run the completion twice.
+                self._reset()
+                raise
+        if resp.status >= 400:
+            raise http.client.HTTPException(f"HTTP {resp.status}")
+        return data
+
+    def _headers_for(self, api_key: str) -> dict[str, str]:
+        if api_key != self._headers_key:
+            self._headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            }
+            self._headers_key = api_key
+        return self._headers
+
     def generate(self, prompt: str, mode_hint: str) -> tuple[str, dict[str, str]]:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -24,24 +124,12 @@ class CloudLLM:
                 {"provider": "offline", "reason": "missing_api_key"},
             )
 
-        payload = {
-            "model": self.model,
-            "input": f"Mode hint: {mode_hint}\nUser: {prompt}",
-        }
-        req = urllib.request.Request(
-            "https://api.openai.com/v1/responses",
-            data=json.dumps(payload).encode("utf-8"),
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            method="POST",
-        )
+        body = self._body_prefix + json.dumps(f"Mode hint: {mode_hint}\nUser: {prompt}").encode("utf-8") + b"}"
 
         try:
-            with urllib.request.urlopen(req, timeout=20) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-        except urllib.error.URLError:
+            # json.loads detects UTF-8 on bytes itself; skipping .decode() avoids a second full copy of the body.
+            data = json.loads(self._post(body, self._headers_for(api_key)))
+        except (OSError, http.client.HTTPException):
             return (
                 "Offline fallback: cloud call failed, so local response mode is active.",
                 {"provider": "offline", "reason": "network_error"},
@@ -19,9 +19,13 @@ MODE_HINTS: dict[Mode, dict[str, str]] = {
     Mode.MOOD: {"tone": "supportive and warm", "verbosity": "balanced"},
 }
 
+# Pre-formatted "tone=...; verbosity=..." hints passed straight to CloudLLM.generate.
+MODE_HINT_STRINGS: dict[Mode, str] = {
+    mode: f"tone={hints['tone']}; verbosity={hints['verbosity']}" for mode, hints in MODE_HINTS.items()
+}
+
+_MODE_BY_VALUE: dict[str, Mode] = {m.value: m for m in Mode}
+
 
 def parse_mode(value: str) -> Mode | None:
-    try:
-        return Mode(value.strip().lower())
-    except ValueError:
-        return None
+    return _MODE_BY_VALUE.get(value.strip().lower())
@@ -12,42 +12,39 @@ from raahib.comfort import (
     supportive_talk_response,
 )
 from raahib.kb import KnowledgeBase, KnowledgeHit
+from raahib.keywords import ISLAMIC
 from raahib.llm import CloudLLM
-from raahib.modes import MODE_HINTS
+from raahib.modes import MODE_HINT_STRINGS
 from raahib.providers import DuaHit, DuaProvider, HadithHit, HadithProvider
 from raahib.safety import SafetyGate
 from raahib.state import AppState
+from raahib.text import NormalizedText
 
 _ISLAMIC_COMFORT_EMOTIONS = {"sadness", "grief", "anxiety", "hopelessness", "fear", "guilt", "happiness", "gratitude", "relief", "peace"}
 
-_ISLAMIC_KEYWORDS = {
-    "quran",
-    "qur'an",
-    "hadith",
-    "dua",
-    "du'a",
-    "imam",
-    "fiqh",
-    "fatwa",
-    "marja",
-    "najaf",
-    "karbala",
-    "allah",
-    "sabr",
-    "ayah",
-    "tafsir",
-    "sunnah",
-    "حديث",
-    "دعاء",
-}
-
 _EXPAND_TRIGGERS = {"full", "more", "expand"}
 
 _COMFORT_ACCEPT_TOKENS = {"yes", "yeah", "ok", "okay", "please", "dua", "hadith", "verse", "quran", "ayah", "something short", "help me"}
 _COMFORT_TALK_TOKENS = {"talk", "can we talk", "i want to talk"}
+_VERSE_TOKENS = ("verse", "quran", "ayah")
+_SOURCE_REQUEST_TOKENS = ("dua", "hadith", *_VERSE_TOKENS)
 _SHORTER_FOLLOWUP_TOKENS = {"this isnt short", "this isn't short", "too long", "give me something shorter", "shorter please"}
 
 
+_HADITH_INTENT = re.compile(r"\bhadith\b|حديث", re.IGNORECASE)
+_DUA_INTENT = re.compile(r"\b(dua|du['’]a)\b|دعاء", re.IGNORECASE)
+
+
+def _mentions_hadith(text: str) -> bool:
+    return _HADITH_INTENT.search(text) is not None
+
+
+def _mentions_dua(text: str) -> bool:
+    if text.lower().strip().startswith("dua for"):
+        return True
+    return _DUA_INTENT.search(text) is not None
+
+
 @dataclass(slots=True)
 class RouteResult:
     text: str
@@ -69,7 +66,6 @@ class Router:
     ) -> None:
         self.state = state
         self.kb = kb or KnowledgeBase(state.settings.kb_db_path)
-        self.kb.init_db()
         self.kb.seed_if_empty()
 
         self.hadith_provider = hadith_provider or HadithProvider(state.settings.HADITH_DB_PATH)
@@ -82,23 +78,23 @@ class Router:
         self.safety = safety or SafetyGate()
         self.llm = llm or CloudLLM()
 
+    def close(self) -> None:
+        """Release the KB connection and the LLM keep-alive connection."""
+        self.kb.close()
+        self.llm.close()
+
     def _is_expand_intent(self, cleaned_text: str) -> bool:
         return cleaned_text.lower() in _EXPAND_TRIGGERS
 
     def _is_explicit_hadith_intent(self, text: str) -> bool:
-        return bool(re.search(r"\bhadith\b|حديث", text, flags=re.IGNORECASE))
+        return _mentions_hadith(text)
 
     def _is_explicit_dua_intent(self, text: str) -> bool:
-        lowered = text.lower().strip()
-        if lowered.startswith("dua for"):
-            return True
-        return bool(re.search(r"\b(dua|du['’]a)\b|دعاء", text, flags=re.IGNORECASE))
+        return _mentions_dua(text)
 
-    def _is_islamic_query(self, user_text: str) -> bool:
-        lowered = user_text.lower()
-        if self._is_explicit_hadith_intent(user_text) or self._is_explicit_dua_intent(user_text):
-            return True
-        return any(keyword in lowered for keyword in _ISLAMIC_KEYWORDS)
+    def _is_islamic_query(self, text: NormalizedText) -> bool:
+        # keyword_buckets() is the pass the safety gate already ran for this turn.
+        return ISLAMIC in text.keyword_buckets() or _mentions_hadith(text.lowered) or _mentions_dua(text.lowered)
 
     def _with_comfort(self, result: RouteResult, emotion_category: str | None, source_type: str) -> RouteResult:
         if not emotion_category:
@@ -166,10 +162,10 @@ class Router:
     def _parse_reference(self, reference: str | None) -> str | None:
         if not reference:
             return None
-        parts = reference.split("URL:", 1)
-        if len(parts) == 2:
-            left = parts[0].strip()
-            right = parts[1].strip()
+        left, sep, right = reference.partition("URL:")
+        if sep:
+            left = left.strip()
+            right = right.strip()
             return f"{left} | URL: {right}" if left else f"URL: {right}"
         return reference.strip()
 
@@ -206,40 +202,28 @@ class Router:
         )
 
     def _format_kb(self, hit: KnowledgeHit) -> RouteResult:
-        top = hit
-        text_parts = [top.card.title]
-        if top.card.arabic:
-            text_parts.append(top.card.arabic)
-        if top.card.translation_en:
-            text_parts.append(top.card.translation_en)
-        if top.card.explanation:
-            text_parts.append(top.card.explanation)
-        text_parts.append(f"Source: {top.card.source_name} ({top.card.reference})")
-        if top.card.auth_grade:
-            text_parts.append(f"Auth grade: {top.card.auth_grade}")
+        card = hit.card
         return RouteResult(
-            text="\n".join(text_parts),
+            text=card.render(),
             metadata={
                 "type": "kb",
-                "card_id": str(top.card.id),
-                "score": f"{top.score:.2f}",
-                "source_name": top.card.source_name,
-                "reference": top.card.reference,
-                "auth_grade": top.card.auth_grade or "",
+                "card_id": str(card.id),
+                "score": f"{hit.score:.2f}",
+                "source_name": card.source_name,
+                "reference": card.reference,
+                "auth_grade": card.auth_grade or "",
             },
         )
 
     def _clear_comfort_offer(self) -> None:
         self.state.pending_comfort_offer = None
 
-    def _is_comfort_offer_acceptance(self, cleaned_text: str) -> bool:
-        lowered = cleaned_text.lower()
+    def _is_comfort_offer_acceptance(self, lowered: str) -> bool:
         if lowered in _COMFORT_ACCEPT_TOKENS:
             return True
-        return any(token in lowered for token in ("dua", "hadith", "verse", "quran", "ayah"))
+        return any(token in lowered for token in _SOURCE_REQUEST_TOKENS)
 
-    def _is_supportive_talk_followup(self, cleaned_text: str) -> bool:
-        lowered = cleaned_text.lower()
+    def _is_supportive_talk_followup(self, lowered: str) -> bool:
         if lowered in _COMFORT_TALK_TOKENS:
             return True
         return len(lowered.split()) > 4 and detect_emotion_category(lowered) is not None
@@ -280,19 +264,19 @@ class Router:
             metadata={"type": "dua_short_miss"},
         )
 
-    def _route_pending_comfort_offer(self, user_text: str) -> RouteResult | None:
+    def _route_pending_comfort_offer(self, text: NormalizedText) -> RouteResult | None:
         pending = self.state.pending_comfort_offer
         if not pending or not pending.get("active"):
             return None
 
-        cleaned = user_text.strip()
-        lowered = cleaned.lower()
+        user_text = text.raw
+        lowered = text.lowered.strip()
         pending_emotion = str(pending.get("emotion") or "") or None
 
-        if self._is_comfort_offer_acceptance(cleaned):
+        if self._is_comfort_offer_acceptance(lowered):
             requested_dua = self._is_explicit_dua_intent(user_text) or "dua" in lowered
             requested_hadith = self._is_explicit_hadith_intent(user_text) or "hadith" in lowered
-            requested_verse = any(token in lowered for token in ("verse", "quran", "ayah"))
+            requested_verse = any(token in lowered for token in _VERSE_TOKENS)
 
             if requested_dua:
                 dua_hits = self._dua_search(user_text, prefer_short=True)
@@ -305,7 +289,7 @@ class Router:
                     self._clear_comfort_offer()
                     return self._with_comfort(self._format_hadith_preview(hadith_hits[0]), pending_emotion, "hadith")
             elif requested_verse:
-                kb_hits = self.kb.search(user_text, limit=self.state.settings.PROVIDER_TOP_K)
+                kb_hits = self.kb.search(text, limit=self.state.settings.PROVIDER_TOP_K)
                 if kb_hits:
                     self._clear_comfort_offer()
                     return self._with_comfort(self._format_kb(kb_hits[0]), pending_emotion, "verse")
@@ -314,7 +298,7 @@ class Router:
                 if dua_hits:
                     self._clear_comfort_offer()
                     return self._with_comfort(self._format_dua_preview(dua_hits[0]), pending_emotion, "dua")
-                kb_hits = self.kb.search(user_text, limit=self.state.settings.PROVIDER_TOP_K)
+                kb_hits = self.kb.search(text, limit=self.state.settings.PROVIDER_TOP_K)
                 if kb_hits:
                     self._clear_comfort_offer()
                     return self._with_comfort(self._format_kb(kb_hits[0]), pending_emotion, "verse")
@@ -332,7 +316,7 @@ class Router:
                 pending_emotion,
             )
 
-        if self._is_supportive_talk_followup(cleaned):
+        if self._is_supportive_talk_followup(lowered):
             return RouteResult(
                 text=supportive_talk_response(),
                 metadata={"type": "comfort_offer_followup"},
@@ -400,7 +384,8 @@ class Router:
                 metadata=command_result.metadata or {"type": "command"},
             )
 
-        safety_result = self.safety.evaluate(user_text, self.state.mode)
+        text = NormalizedText.of(user_text)
+        safety_result = self.safety.evaluate(text, self.state.mode)
         if not safety_result.allowed:
             return RouteResult(
                 text=safety_result.message,
@@ -408,17 +393,18 @@ class Router:
             )
 
         emotion_category = detect_emotion_category(user_text)
-        pending_result = self._route_pending_comfort_offer(user_text)
+        pending_result = self._route_pending_comfort_offer(text)
         if pending_result:
             return pending_result
 
         explicit_hadith = self._is_explicit_hadith_intent(user_text)
         explicit_dua = self._is_explicit_dua_intent(user_text)
         emotional_islamic = emotion_category in _ISLAMIC_COMFORT_EMOTIONS
-        islamic = self._is_islamic_query(user_text) or emotional_islamic
+        islamic_query = self._is_islamic_query(text)
+        islamic = islamic_query or emotional_islamic
         emotional_prefer_dua = bool(emotional_islamic and not explicit_hadith and not explicit_dua)
 
-        if emotional_islamic and not explicit_hadith and not explicit_dua and not self._is_islamic_query(user_text):
+        if emotional_islamic and not explicit_hadith and not explicit_dua and not islamic_query:
             self.state.pending_comfort_offer = {"emotion": emotion_category or "unknown", "active": True}
             return RouteResult(
                 text=comfort_offer_for(emotion_category or ""),
@@ -447,7 +433,7 @@ class Router:
 
         if islamic:
             self._clear_comfort_offer()
-            kb_hits = self.kb.search(user_text, limit=self.state.settings.PROVIDER_TOP_K)
+            kb_hits = self.kb.search(text, limit=self.state.settings.PROVIDER_TOP_K)
             if kb_hits and kb_hits[0].score >= self.state.settings.kb_strong_match_threshold and not emotional_prefer_dua:
                 return self._with_comfort(self._format_kb(kb_hits[0]), emotion_category, "verse")
 
@@ -483,15 +469,14 @@ class Router:
             )
 
         self._clear_comfort_offer()
-        hits = self.kb.search(user_text)
+        hits = self.kb.search(text)
         if hits:
-            top = max(hits, key=lambda hit: hit.score)
+            # search() returns hits best-first.
+            top = hits[0]
             if top.score >= self.state.settings.kb_strong_match_threshold:
                 return self._format_kb(top)
 
-        hints = MODE_HINTS[self.state.mode]
-        mode_hint = f"tone={hints['tone']}; verbosity={hints['verbosity']}"
-        llm_text, llm_meta = self.llm.generate(user_text, mode_hint=mode_hint)
+        llm_text, llm_meta = self.llm.generate(user_text, mode_hint=MODE_HINT_STRINGS[self.state.mode])
 
         if safety_result.message:
             llm_text = f"{safety_result.message} {llm_text}".strip()
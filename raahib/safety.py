@@ -2,24 +2,11 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
+from raahib.keywords import CRISIS, DISALLOWED, HEALTH
+# The keyword sets now live in raahib.keywords; keep them importable from here.
+from raahib.keywords import CRISIS_KEYWORDS, DISALLOWED_REQUEST_KEYWORDS, HEALTH_DIAGNOSIS_TERMS  # noqa: F401
 from raahib.modes import Mode
-
-
-CRISIS_KEYWORDS = {
-    "suicide",
-    "kill myself",
-    "end my life",
-    "self-harm",
-    "hurt myself",
-}
-
-DISALLOWED_REQUEST_KEYWORDS = {
-    "build a bomb",
-    "make explosives",
-    "bypass law enforcement",
-}
-
-HEALTH_DIAGNOSIS_TERMS = {"diagnose", "diagnosis", "what disease", "medical certainty"}
+from raahib.text import NormalizedText
 
 
 @dataclass(slots=True)
@@ -30,17 +17,17 @@ class SafetyResult:
 
 
 class SafetyGate:
-    def evaluate(self, text: str, mode: Mode) -> SafetyResult:
-        lowered = text.lower()
+    def evaluate(self, text: str | NormalizedText, mode: Mode) -> SafetyResult:
+        found = NormalizedText.of(text).keyword_buckets()
 
-        if any(keyword in lowered for keyword in DISALLOWED_REQUEST_KEYWORDS):
+        if DISALLOWED in found:
             return SafetyResult(
                 allowed=False,
                 message="I can't help with dangerous or illegal requests.",
                 metadata={"type": "safety", "reason": "disallowed_domain"},
             )
 
-        if mode is Mode.MOOD and any(keyword in lowered for keyword in CRISIS_KEYWORDS):
+        if mode is Mode.MOOD and CRISIS in found:
             return SafetyResult(
                 allowed=False,
                 message=(
@@ -50,7 +37,7 @@ class SafetyGate:
                 metadata={"type": "safety", "reason": "crisis_guidance"},
             )
 
-        if mode is Mode.HEALTH and any(term in lowered for term in HEALTH_DIAGNOSIS_TERMS):
+        if mode is Mode.HEALTH and HEALTH in found:
             return SafetyResult(
                 allowed=True,
                 message="I can share general health information, but this is not a diagnosis.",
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass, field
 
 from raahib.config import DEFAULT_SETTINGS, Settings
@@ -9,16 +10,36 @@ from raahib.modes import Mode
 @dataclass(slots=True)
 class AppState:
     mode: Mode = Mode.GENERAL
-    short_term_history: list[str] = field(default_factory=list)
+    short_term_history: deque[str] = field(default_factory=deque)
     capabilities: dict[str, bool] = field(
         default_factory=lambda: DEFAULT_SETTINGS.capabilities.copy()
     )
     settings: Settings = field(default_factory=lambda: DEFAULT_SETTINGS)
     last_item: dict[str, int | str] | None = None
     pending_comfort_offer: dict[str, str | bool] | None = None
+    _capabilities_summary: tuple[tuple[tuple[str, bool], ...], str] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        # Bounded ring buffer: appends past the cap evict the oldest entry in O(1).
+        self.short_term_history = deque(self.short_term_history, maxlen=self.settings.max_short_term_memory)
+
+    def capabilities_summary(self) -> str:
+        """Return "name=on|off, ..." sorted by name, recomputed only after the flags change."""
+        # Snapshotting a handful of flags is cheaper than sorting and formatting them on every status call.
+        items = tuple(self.capabilities.items())
+        cached = self._capabilities_summary
+        if cached is not None and cached[0] == items:
+            return cached[1]
+        summary = ", ".join(f"{k}={'on' if v else 'off'}" for k, v in sorted(items))
+        self._capabilities_summary = (items, summary)
+        return summary
 
     def remember(self, message: str) -> None:
-        self.short_term_history.append(message)
-        overflow = len(self.short_term_history) - self.settings.max_short_term_memory
-        if overflow > 0:
-            del self.short_term_history[:overflow]
+        history = self.short_term_history
+        limit = self.settings.max_short_term_memory
+        if history.maxlen != limit:
+            # settings was replaced after construction; re-cap the buffer, keeping the newest entries.
+            history = self.short_term_history = deque(history, maxlen=limit)
+        history.append(message)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+from raahib.keywords import KEYWORD_MATCHER
+
+# Arabic tanween, harakat, shadda, sukun, superscript alef and tatweel: marks users rarely type.
+_ARABIC_MARKS = str.maketrans("", "", "\u064b\u064c\u064d\u064e\u064f\u0650\u0651\u0652\u0670\u0640")
+_POSSESSIVE = re.compile(r"['\u2019]s\b")
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def fold_text(text: str) -> str:
+    """Lowered text with Arabic diacritics and possessive "'s" removed and other punctuation turned into single
+    spaces, so "Allah's" matches "allah", "patience,sabr" keeps its two words and "صبر" matches "صَبْر"."""
+    folded = _POSSESSIVE.sub("", text.lower().translate(_ARABIC_MARKS))
+    return " ".join(_PUNCTUATION.sub(" ", folded).split())
+
+
+@dataclass(slots=True)
+class NormalizedText:
+    """One user turn, lowered and tokenized once and shared by the router, safety gate and KB search."""
+
+    raw: str
+    lowered: str
+    tokens: tuple[str, ...]
+    _buckets: frozenset[str] | None = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def of(cls, text: str | NormalizedText) -> NormalizedText:
+        if isinstance(text, NormalizedText):
+            return text
+        lowered = text.lower()
+        return cls(text, lowered, tuple(lowered.split()))
+
+    def keyword_buckets(self) -> frozenset[str]:
+        """Keyword buckets present in the text (see raahib.keywords), computed on first use."""
+        buckets = self._buckets
+        if buckets is None:
+            buckets = self._buckets = frozenset(KEYWORD_MATCHER.buckets_in(self.lowered))
+        return buckets